@@ -50,7 +50,7 @@ def start_scrape():
                     'success': True,
                     'filename': os.path.basename(csv_filename),
                     'download_url': f'/download/{os.path.basename(csv_filename)}',
-                    'clinic_count': len(scraper.clinic_data)
+                    'clinic_count': scraper.get_progress()['clinic_count']
                 }
             }
     
@@ -5,252 +5,537 @@
 """
 
 import requests
-from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from bs4.dammit import EncodingDetector
+import lxml.html
+from lxml import etree
+import codecs
+import asyncio
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import os
 import time
 from urllib.parse import urljoin, urlparse
 import re
 import csv
 from datetime import datetime
+from functools import lru_cache
 import json
+import shutil
+import uuid
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None  # 未インストールの場合はスレッドプールで取得
+
+# brotliが入っている場合のみbr圧縮を要求（requests/aiohttpが展開に使用）
+try:
+    import brotli  # noqa: F401
+    _ACCEPT_ENCODING = 'gzip, deflate, br'
+except ImportError:
+    _ACCEPT_ENCODING = 'gzip, deflate'
+
+
+def _class_xpath(tag, class_name):
+    """class属性に指定クラスを含む要素を探すXPath"""
+    return etree.XPath(
+        f'.//{tag}[contains(concat(" ", normalize-space(@class), " "), " {class_name} ")]'
+    )
+
+
+# 抽出用XPath（モジュール読み込み時に一度だけコンパイル）
+_TR_XPATH = etree.XPath('.//tr[th and td]')
+# get_text()と同様に<script>/<style>内のテキストは除外
+_TEXT_XPATH = etree.XPath('.//text()[not(ancestor::script or ancestor::style)]')
+_LINK_XPATH = etree.XPath('.//a[@href]')
+_DIO_NAME_XPATH = _class_xpath('h2', 'clinic-name')
+_DIO_ADDRESS_XPATH = _class_xpath('div', 'address')
+_DIO_ACCESS_XPATH = _class_xpath('div', 'access')
+
+# Content-Typeヘッダーのcharset
+_CHARSET_RE = re.compile(r'charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+# 店舗リンクのパターン（/clinic/, /store/, /shop/, /access/ 配下）
+_LINK_RE = re.compile(r'/(?:clinic|store|shop|access)/[^/]+/?$')
+
+# 都道府県名（「〜県」は43県を列挙）
+_PREFECTURE = (
+    '(?:北海道|東京都|大阪府|京都府|(?:'
+    '青森|岩手|宮城|秋田|山形|福島|茨城|栃木|群馬|埼玉|千葉|神奈川|'
+    '新潟|富山|石川|福井|山梨|長野|岐阜|静岡|愛知|三重|'
+    '滋賀|兵庫|奈良|和歌山|鳥取|島根|岡山|広島|山口|'
+    '徳島|香川|愛媛|高知|福岡|佐賀|長崎|熊本|大分|宮崎|鹿児島|沖縄'
+    ')県)'
+)
+
+# 住所っぽいパターン（長いページでのバックトラックを防ぐため繰り返し回数を制限）
+_ADDRESS_PATTERNS = [
+    re.compile(r'〒\d{3}-\d{4}[^\n]{0,80}?[都道府県][^\n]{0,60}?[市区町村]'),
+    re.compile(_PREFECTURE + r'[^\n]{0,60}?[市区町村][^\n]{0,40}?\d+'),
+]
+
+# 駅名と徒歩分数（同上の理由で繰り返し回数を制限）
+_ACCESS_RE = re.compile(r'[^\n]{0,40}?駅[^\n]{0,20}?(?:徒歩|歩いて)[^\n]{0,10}?\d+分')
+
+# 住所・アクセスが書かれていそうな要素（<address>を優先し、次にclass/id名で判定）
+_CONTACT_XPATHS = [
+    etree.XPath('.//address'),
+    etree.XPath(
+        './/*[contains(@class, "address") or contains(@class, "access")'
+        ' or contains(@id, "address") or contains(@id, "access")]'
+    ),
+]
+
+
+def _text(elem):
+    """BeautifulSoupのget_text(strip=True)相当のテキストを取得"""
+    return ''.join(s.strip() for s in _TEXT_XPATH(elem))
+
+
+def _all_text(elem):
+    """BeautifulSoupのget_text()相当のテキストを取得"""
+    return ''.join(_TEXT_XPATH(elem))
+
+
+def _charset_from_headers(headers):
+    """Content-Typeヘッダーのcharsetを取得（指定がなければNone）"""
+    match = _CHARSET_RE.search(headers.get('Content-Type', ''))
+    return match.group(1) if match else None
+
+
+def _normalize_encoding(encoding):
+    """Pythonが扱える文字コード名に正規化（不明な場合はNone）"""
+    if not encoding:
+        return None
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def _html_parser(encoding):
+    """文字コードを指定したHTMLパーサーを取得"""
+    return lxml.html.HTMLParser(encoding=encoding)
+
+
+def _parse_html(content, encoding=None):
+    """HTMLを解析（HTTPヘッダー、metaタグの順に文字コードを判定し、なければUTF-8）"""
+    encoding = (
+        _normalize_encoding(encoding)
+        or _normalize_encoding(EncodingDetector.find_declared_encoding(content, is_html=True))
+        or 'utf-8'
+    )
+    try:
+        parser = _html_parser(encoding)
+    except LookupError:
+        # libxml2が扱えない文字コードはPythonでデコードしてから解析
+        return lxml.html.fromstring(content.decode(encoding, errors='replace'))
+    return lxml.html.fromstring(content, parser=parser)
+
+def _match_address_access(clinic_info, text):
+    """テキストから未取得の住所・アクセス情報を埋め、両方揃ったらTrueを返す"""
+    if not clinic_info['address']:
+        for pattern in _ADDRESS_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                clinic_info['address'] = match.group(0)
+                break
+    
+    if not clinic_info['access']:
+        match = _ACCESS_RE.search(text)
+        if match:
+            clinic_info['access'] = match.group(0)
+    
+    return bool(clinic_info['address'] and clinic_info['access'])
+
+
+def _first(xpath, tree):
+    """XPathに一致する最初の要素を返す"""
+    result = xpath(tree)
+    return result[0] if result else None
+
+
+def _new_clinic_info(url, clinic_name):
+    """空の店舗情報を作成"""
+    return {
+        'name': clinic_name,
+        'address': '',
+        'access': '',
+        'url': url
+    }
+
+
+def _extract_dio(tree, url, clinic_name):
+    """DIOクリニック"""
+    clinic_info = _new_clinic_info(url, clinic_name)
+    
+    # 店舗名
+    name_elem = _first(_DIO_NAME_XPATH, tree)
+    if name_elem is not None:
+        clinic_info['name'] = _text(name_elem)
+    
+    # 住所
+    address_elem = _first(_DIO_ADDRESS_XPATH, tree)
+    if address_elem is not None:
+        clinic_info['address'] = _text(address_elem)
+    
+    # アクセス
+    access_elem = _first(_DIO_ACCESS_XPATH, tree)
+    if access_elem is not None:
+        clinic_info['access'] = _text(access_elem)
+    
+    return clinic_info
+
+
+def _extract_eminal(tree, url, clinic_name):
+    """エミナルクリニック"""
+    clinic_info = _new_clinic_info(url, clinic_name)
+    
+    # 店舗情報テーブルから抽出
+    for tr in _TR_XPATH(tree):
+        header = _text(tr.find('.//th'))
+        value = _text(tr.find('.//td'))
+        if '院名' in header:
+            clinic_info['name'] = value
+        elif '住所' in header:
+            clinic_info['address'] = value
+        elif 'アクセス' in header:
+            clinic_info['access'] = value
+    
+    return clinic_info
+
+
+def _extract_frey(tree, url, clinic_name):
+    """フレイアクリニック"""
+    clinic_info = _new_clinic_info(url, clinic_name)
+    
+    # 店舗名
+    h1_elem = tree.find('.//h1')
+    if h1_elem is not None:
+        clinic_info['name'] = _text(h1_elem)
+    
+    # テーブルから情報抽出
+    for tr in _TR_XPATH(tree):
+        header = _text(tr.find('.//th'))
+        value = _text(tr.find('.//td'))
+        if '所在地' in header:
+            clinic_info['address'] = value
+        elif 'アクセス' in header:
+            clinic_info['access'] = value
+    
+    return clinic_info
+
+
+def _extract_generic(tree, url, clinic_name):
+    """汎用的な抽出（専用処理のないサイト）"""
+    clinic_info = _new_clinic_info(url, clinic_name)
+    
+    # 店舗名の抽出（h1, h2タグ）
+    if not clinic_info['name']:
+        for tag in ['h1', 'h2']:
+            elem = tree.find(f'.//{tag}')
+            if elem is not None:
+                text = _text(elem)
+                if '院' in text or 'クリニック' in text:
+                    clinic_info['name'] = text
+                    break
+    
+    # 住所・アクセス情報の抽出（候補要素を優先し、見つからなければページ全体）
+    found = False
+    candidates = (elem for xpath in _CONTACT_XPATHS for elem in xpath(tree))
+    for elem in candidates:
+        if _match_address_access(clinic_info, _all_text(elem)):
+            found = True
+            break
+    
+    if not found:
+        _match_address_access(clinic_info, _all_text(tree))
+    
+    return clinic_info
+
+
+# ドメインに含まれる文字列 -> サイト専用の抽出処理
+_EXTRACTORS = {
+    'dioclinic': _extract_dio,
+    'eminal-clinic': _extract_eminal,
+    'frey-a': _extract_frey,
+}
+
+
+@lru_cache(maxsize=None)
+def _find_extractor(domain):
+    """ドメインに対応するサイト専用の抽出処理を返す（なければNone）"""
+    return next((fn for key, fn in _EXTRACTORS.items() if key in domain), None)
 
 
 class ClinicInfoScraper:
     def __init__(self):
         self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+            'Accept': 'text/html,application/xhtml+xml',
+            'Accept-Encoding': _ACCEPT_ENCODING
         }
-        self.progress = 0
-        self.total = 0
-        self.status = "待機中"
-        self.current_action = ""
-        self.clinic_data = []
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(pool_connections=10, pool_maxsize=20,
+                              max_retries=Retry(total=3, backoff_factor=0.3))
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self._entry_netloc = None
+        self._entry_prefixes = ()
+        self.csv_filename = None
+        self._csv_file = None
+        self._csv_writer = None
+        self._clinic_count = 0
+        self._progress = {
+            'progress': 0,
+            'total': 0,
+            'percentage': 0,
+            'status': "待機中",
+            'current_action': "",
+            'clinic_count': 0
+        }
+        self.concurrency = 8  # 同時リクエスト数
+        self.request_delay = 1  # リクエスト間隔（秒）
         
     def get_progress(self):
         """進捗状況を取得"""
-        return {
-            'progress': self.progress,
-            'total': self.total,
-            'percentage': int((self.progress / self.total * 100) if self.total > 0 else 0),
-            'status': self.status,
-            'current_action': self.current_action,
-            'clinic_count': len(self.clinic_data)
-        }
+        # 呼び出し側で書き換えられるためコピーを返す
+        return dict(self._progress)
     
-    def extract_clinic_info(self, soup, url, clinic_name=""):
-        """ページから店舗情報を抽出"""
-        clinic_info = {
-            'name': clinic_name,
-            'address': '',
-            'access': '',
-            'url': url
-        }
-        
-        domain = urlparse(url).netloc
+    def _update_progress(self, **fields):
+        """進捗状況を更新"""
+        self._progress.update(fields)
+        if 'progress' in fields or 'total' in fields:
+            progress = self._progress['progress']
+            total = self._progress['total']
+            self._progress['percentage'] = int((progress / total * 100) if total > 0 else 0)
+    
+    def _open_csv(self, domain):
+        """CSVファイルを開いてヘッダーを書き込む"""
+        # 同時に実行された別セッションのファイルと衝突しないよう一意な名前にする
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        self.csv_filename = f"downloads/{domain}_clinics_{timestamp}_{uuid.uuid4().hex[:8]}.csv"
+        os.makedirs(os.path.dirname(self.csv_filename), exist_ok=True)
         
-        # DIOクリニック
-        if 'dioclinic' in domain:
-            # 店舗名
-            name_elem = soup.find('h2', class_='clinic-name')
-            if name_elem:
-                clinic_info['name'] = name_elem.get_text(strip=True)
-            
-            # 住所
-            address_elem = soup.find('div', class_='address')
-            if address_elem:
-                clinic_info['address'] = address_elem.get_text(strip=True)
-            
-            # アクセス
-            access_elem = soup.find('div', class_='access')
-            if access_elem:
-                clinic_info['access'] = access_elem.get_text(strip=True)
+        self._csv_file = open(self.csv_filename, 'x', newline='', encoding='utf-8-sig')
+        self._csv_writer = csv.writer(self._csv_file)
+        self._csv_writer.writerow(['店舗名', '住所', 'アクセス', 'URL'])
+    
+    def _close_csv(self, discard=False):
+        """CSVファイルを閉じる（discard=Trueの場合は削除）"""
+        if self._csv_file is not None:
+            self._csv_file.close()
+            self._csv_file = None
+            self._csv_writer = None
         
-        # エミナルクリニック
-        elif 'eminal-clinic' in domain:
-            # 店舗情報テーブルから抽出
-            for tr in soup.find_all('tr'):
-                th = tr.find('th')
-                td = tr.find('td')
-                if th and td:
-                    header = th.get_text(strip=True)
-                    if '院名' in header:
-                        clinic_info['name'] = td.get_text(strip=True)
-                    elif '住所' in header:
-                        clinic_info['address'] = td.get_text(strip=True)
-                    elif 'アクセス' in header:
-                        clinic_info['access'] = td.get_text(strip=True)
+        if discard and self.csv_filename and os.path.exists(self.csv_filename):
+            os.remove(self.csv_filename)
+            self.csv_filename = None
+    
+    def _add_clinic(self, clinic_info):
+        """取得した店舗情報をCSVに書き込む"""
+        self._csv_writer.writerow(
+            (clinic_info['name'], clinic_info['address'], clinic_info['access'], clinic_info['url'])
+        )
+        self._clinic_count += 1
+        self._progress['clinic_count'] = self._clinic_count
+    
+    def _get_domain(self, url):
+        """URLのドメインを取得（入力URLと同じホストなら解析を省略）"""
+        if self._entry_netloc and url.startswith(self._entry_prefixes):
+            return self._entry_netloc
+        return urlparse(url).netloc
+    
+    def extract_clinic_info(self, tree, url, clinic_name=""):
+        """ページから店舗情報を抽出"""
+        domain = self._get_domain(url)
         
-        # フレイアクリニック
-        elif 'frey-a' in domain:
-            # 店舗名
-            h1_elem = soup.find('h1')
-            if h1_elem:
-                clinic_info['name'] = h1_elem.get_text(strip=True)
-            
-            # テーブルから情報抽出
-            for tr in soup.find_all('tr'):
-                th = tr.find('th')
-                td = tr.find('td')
-                if th and td:
-                    header = th.get_text(strip=True)
-                    if '所在地' in header:
-                        clinic_info['address'] = td.get_text(strip=True)
-                    elif 'アクセス' in header:
-                        clinic_info['access'] = td.get_text(strip=True)
+        # サイト専用の抽出処理
+        extractor = _find_extractor(domain)
+        if extractor is not None:
+            return extractor(tree, url, clinic_name)
         
         # 汎用的な抽出（上記以外のサイト）
-        else:
-            # 店舗名の抽出（h1, h2タグ）
-            if not clinic_info['name']:
-                for tag in ['h1', 'h2']:
-                    elem = soup.find(tag)
-                    if elem:
-                        text = elem.get_text(strip=True)
-                        if '院' in text or 'クリニック' in text:
-                            clinic_info['name'] = text
-                            break
-            
-            # 住所の抽出（住所っぽいパターン）
-            address_patterns = [
-                r'〒\d{3}-\d{4}.*?(?:都|道|府|県).*?(?:市|区|町|村)',
-                r'(?:東京都|大阪府|京都府|北海道|.*?県).*?(?:市|区|町|村).*?\d+',
-            ]
-            
-            text_content = soup.get_text()
-            for pattern in address_patterns:
-                match = re.search(pattern, text_content)
-                if match:
-                    clinic_info['address'] = match.group(0)
-                    break
-            
-            # アクセス情報の抽出（駅名と徒歩分数）
-            access_pattern = r'(?:JR|東京メトロ|都営|私鉄)?.*?(?:線)?.*?駅.*?(?:徒歩|歩いて).*?\d+分'
-            access_match = re.search(access_pattern, text_content)
-            if access_match:
-                clinic_info['access'] = access_match.group(0)
-        
-        return clinic_info
+        return _extract_generic(tree, url, clinic_name)
     
-    def find_clinic_links(self, soup, base_url):
+    def find_clinic_links(self, tree, base_url):
         """店舗一覧ページから各店舗のリンクを取得"""
         clinic_links = []
-        domain = urlparse(base_url).netloc
-        
-        # 店舗リンクのパターン
-        link_patterns = [
-            r'/clinic/[^/]+/?$',
-            r'/store/[^/]+/?$',
-            r'/shop/[^/]+/?$',
-            r'/access/[^/]+/?$',
-        ]
+        seen = set()  # 重複除去用
         
         # すべてのリンクを確認
-        for a in soup.find_all('a', href=True):
-            href = a['href']
-            absolute_url = urljoin(base_url, href)
+        for a in _LINK_XPATH(tree):
+            href = a.get('href')
             
             # パターンマッチング
-            for pattern in link_patterns:
-                if re.search(pattern, href):
-                    clinic_links.append({
-                        'url': absolute_url,
-                        'name': a.get_text(strip=True)
-                    })
-                    break
+            if not _LINK_RE.search(href):
+                continue
+            
+            absolute_url = urljoin(base_url, href)
+            if absolute_url in seen:
+                continue
+            seen.add(absolute_url)
+            
+            clinic_links.append({
+                'url': absolute_url,
+                'name': _text(a)
+            })
         
-        # 重複を除去
-        seen = set()
-        unique_links = []
-        for link in clinic_links:
-            if link['url'] not in seen:
-                seen.add(link['url'])
-                unique_links.append(link)
+        return clinic_links
+    
+    async def _fetch(self, session, sem, link):
+        """店舗ページを取得して (リンク, 本文, 文字コード) を返す（取得失敗時の本文はNone）"""
+        async with sem:
+            self._update_progress(current_action=f"取得中: {link['name']}")
+            try:
+                timeout = aiohttp.ClientTimeout(total=10)
+                async with session.get(link['url'], timeout=timeout) as response:
+                    response.raise_for_status()
+                    body = await response.read()
+                    encoding = _charset_from_headers(response.headers)
+                await asyncio.sleep(self.request_delay)  # サーバー負荷軽減
+            except Exception as e:
+                print(f"店舗ページ取得エラー: {link['url']} - {str(e)}")
+                return link, None, None
+            finally:
+                progress = self._progress['progress'] + 1
+                self._update_progress(
+                    progress=progress,
+                    status=f"店舗情報を取得中... ({progress}/{self._progress['total']})"
+                )
         
-        return unique_links
+        return link, body, encoding
+    
+    async def _fetch_all(self, clinic_links):
+        """店舗ページを並列に取得し、取得できたものから順に処理"""
+        sem = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(limit=10)
+        async with aiohttp.ClientSession(headers=self.headers, connector=connector) as session:
+            tasks = [self._fetch(session, sem, link) for link in clinic_links]
+            for future in asyncio.as_completed(tasks):
+                link, body, encoding = await future
+                if body is not None:
+                    self._process_page(link, body, encoding)
+    
+    def _fetch_sync(self, link):
+        """店舗ページを取得して (本文, 文字コード) を返す（スレッド用）"""
+        self._update_progress(current_action=f"取得中: {link['name']}")
+        response = self.session.get(link['url'], timeout=10)
+        response.raise_for_status()
+        time.sleep(self.request_delay)  # サーバー負荷軽減
+        return response.content, _charset_from_headers(response.headers)
+    
+    def _fetch_all_threaded(self, clinic_links):
+        """店舗ページをスレッドプールで並列に取得し、取得できたものから順に処理（aiohttp未導入時）"""
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            futures = {executor.submit(self._fetch_sync, link): link for link in clinic_links}
+            for future in as_completed(futures):
+                link = futures.pop(future)  # 処理後に本文を保持し続けないよう参照を外す
+                progress = self._progress['progress'] + 1
+                self._update_progress(
+                    progress=progress,
+                    status=f"店舗情報を取得中... ({progress}/{self._progress['total']})"
+                )
+                
+                try:
+                    body, encoding = future.result()
+                except Exception as e:
+                    print(f"店舗ページ取得エラー: {link['url']} - {str(e)}")
+                    continue
+                
+                self._process_page(link, body, encoding)
+    
+    def _process_page(self, link, body, encoding):
+        """取得した店舗ページを解析してCSVに書き込む"""
+        try:
+            clinic_tree = _parse_html(body, encoding)
+            
+            # 店舗情報を抽出
+            clinic_info = self.extract_clinic_info(clinic_tree, link['url'], link['name'])
+            if clinic_info['name']:
+                self._add_clinic(clinic_info)
+            
+        except Exception as e:
+            print(f"店舗ページ取得エラー: {link['url']} - {str(e)}")
     
     def scrape_clinics(self, url):
         """メイン処理"""
         try:
-            self.status = "ページを取得中..."
-            self.current_action = f"URL: {url}"
+            self._update_progress(status="ページを取得中...", current_action=f"URL: {url}")
+            
+            # 入力URLのドメインを保持（同じホストのページではURL解析を省略）
+            parsed = urlparse(url)
+            origin = f"{parsed.scheme}://{parsed.netloc}"
+            self._entry_netloc = parsed.netloc
+            self._entry_prefixes = (origin + '/', origin + '?', origin + '#')
             
             # ページ取得
-            response = requests.get(url, headers=self.headers, timeout=10)
+            response = self.session.get(url, timeout=10)
             response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
+            tree = _parse_html(response.content, _charset_from_headers(response.headers))
+            
+            # 取得した店舗情報は逐次CSVに書き込む
+            self._open_csv(self._entry_netloc)
             
             # まず現在のページから情報を抽出
-            self.status = "店舗情報を抽出中..."
-            current_page_info = self.extract_clinic_info(soup, url)
+            self._update_progress(status="店舗情報を抽出中...")
+            current_page_info = self.extract_clinic_info(tree, url)
             
             # 店舗情報が取得できた場合は追加
+            current_page_added = False
             if current_page_info['name'] and (current_page_info['address'] or current_page_info['access']):
-                self.clinic_data.append(current_page_info)
-                self.progress = 1
-                self.total = 1
+                self._add_clinic(current_page_info)
+                current_page_added = True
+                self._update_progress(progress=1, total=1)
             
             # 店舗一覧ページかチェック（複数の店舗リンクがある場合）
-            clinic_links = self.find_clinic_links(soup, url)
+            # 抽出用に解析済みのツリーをそのまま使う（ページの再解析はしない）
+            clinic_links = self.find_clinic_links(tree, url)
             
             if len(clinic_links) > 3:  # 3つ以上のリンクがある場合は一覧ページと判断
-                self.total = len(clinic_links)
-                self.progress = 0
+                # 取得済みの現在のページは再取得しない
+                if current_page_added:
+                    clinic_links = [link for link in clinic_links if link['url'] != url]
+                
+                self._update_progress(progress=0, total=len(clinic_links))
                 
-                for i, link in enumerate(clinic_links):
-                    self.progress = i + 1
-                    self.status = f"店舗情報を取得中... ({self.progress}/{self.total})"
-                    self.current_action = f"取得中: {link['name']}"
-                    
-                    try:
-                        # 各店舗ページを取得
-                        clinic_response = requests.get(link['url'], headers=self.headers, timeout=10)
-                        clinic_response.raise_for_status()
-                        clinic_soup = BeautifulSoup(clinic_response.content, 'html.parser')
-                        
-                        # 店舗情報を抽出
-                        clinic_info = self.extract_clinic_info(clinic_soup, link['url'], link['name'])
-                        if clinic_info['name']:
-                            self.clinic_data.append(clinic_info)
-                        
-                        time.sleep(1)  # サーバー負荷軽減
-                        
-                    except Exception as e:
-                        print(f"店舗ページ取得エラー: {link['url']} - {str(e)}")
-                        continue
+                # 取得できたページから順に解析してCSVに書き込む（本文は処理後に破棄）
+                if aiohttp is not None:
+                    asyncio.run(self._fetch_all(clinic_links))
+                else:
+                    self._fetch_all_threaded(clinic_links)
             
-            self.status = "完了"
-            self.current_action = f"{len(self.clinic_data)}件の店舗情報を取得しました"
+            self._update_progress(
+                status="完了",
+                current_action=f"{self._clinic_count}件の店舗情報を取得しました"
+            )
             
             return True
             
         except Exception as e:
-            self.status = "エラー"
-            self.current_action = str(e)
+            self._close_csv(discard=True)
+            self._update_progress(status="エラー", current_action=str(e))
             return False
+        
+        finally:
+            self._close_csv()
     
     def save_to_csv(self, filename=None):
-        """取得したデータをCSVに保存"""
-        if not filename:
-            timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-            domain = urlparse(self.clinic_data[0]['url']).netloc if self.clinic_data else 'clinics'
-            filename = f"downloads/{domain}_clinics_{timestamp}.csv"
-        
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
+        """取得したデータを保存したCSVのパスを返す（データはスクレイピング中に書き込み済み）"""
+        if self.csv_filename is None:
+            # まだ何も取得していない場合はヘッダーのみのCSVを作成
+            self._open_csv('clinics')
+            self._close_csv()
         
-        with open(filename, 'w', newline='', encoding='utf-8-sig') as csvfile:
-            fieldnames = ['店舗名', '住所', 'アクセス', 'URL']
-            writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-            
-            writer.writeheader()
-            for clinic in self.clinic_data:
-                writer.writerow({
-                    '店舗名': clinic['name'],
-                    '住所': clinic['address'],
-                    'アクセス': clinic['access'],
-                    'URL': clinic['url']
-                })
+        if filename and filename != self.csv_filename:
+            os.makedirs(os.path.dirname(filename), exist_ok=True)
+            shutil.copyfile(self.csv_filename, filename)
+            return filename
         
-        return filename
+        return self.csv_filename
 
 
 # テスト用
@@ -263,15 +548,17 @@ if __name__ == "__main__":
     print("スクレイピングを開始します...")
     success = scraper.scrape_clinics(test_url)
     
-    if success and scraper.clinic_data:
+    clinic_count = scraper.get_progress()['clinic_count']
+    if success and clinic_count:
         csv_file = scraper.save_to_csv()
         print(f"\nCSVファイルを保存しました: {csv_file}")
-        print(f"取得した店舗数: {len(scraper.clinic_data)}")
+        print(f"取得した店舗数: {clinic_count}")
         
         # 結果を表示
-        for clinic in scraper.clinic_data:
-            print(f"\n店舗名: {clinic['name']}")
-            print(f"住所: {clinic['address']}")
-            print(f"アクセス: {clinic['access']}")
+        with open(csv_file, newline='', encoding='utf-8-sig') as csvfile:
+            for clinic in csv.DictReader(csvfile):
+                print(f"\n店舗名: {clinic['店舗名']}")
+                print(f"住所: {clinic['住所']}")
+                print(f"アクセス: {clinic['アクセス']}")
     else:
         print("スクレイピングに失敗しました")
\ No newline at end of file